@@ -9,15 +9,32 @@ Converts FreeDict/WikDict TEI XML dictionaries to:
 - .u8: UTF-8 tab-separated format (headword, pos, gender, pron, translations, definition)
 - .idx: Sorted index for binary search (headword_lower, byte_offset, byte_length)
 
-Processes all *.tei files in the current directory.
+With --binary-index, the same sorted index is also written in binary form
+for readers that mmap and bisect it without parsing text:
+- .keys: the index headwords (escaped as in .idx), UTF-8, concatenated
+- .idxb: one fixed-width little-endian record per headword, in .idx order:
+  (key_start: u64, key_length: u32, byte_offset: u64, byte_length: u32),
+  where key_start/key_length locate the headword in .keys
+
+Processes all *.tei files in the current directory, in parallel worker
+processes (up to one per CPU).
 """
 
 # pylint: disable=c-extension-no-member
 
+import argparse
+import heapq
+import io
+import os
+import struct
 import sys
+import tempfile
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+from operator import itemgetter
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
 
 try:
     from lxml import etree
@@ -28,15 +45,51 @@ except ImportError:
 
 # TEI namespace
 TEI_NS = "{http://www.tei-c.org/ns/1.0}"
+_NS = {'tei': 'http://www.tei-c.org/ns/1.0'}
+
+# Precompiled XPath lookups used by parse_entry (compiled once, not per entry)
+_ORTH, _PRON, _POS, _GEN, _QUOTES, _DEFS = [
+    etree.XPath(path, namespaces=_NS) for path in (
+        './/tei:orth',
+        './/tei:form/tei:pron',
+        './/tei:pos',
+        './/tei:gen',
+        ".//tei:sense/tei:cit[@type='trans']/tei:quote",
+        './/tei:sense/tei:def',
+    )
+]
+
+# String value of an element (all descendant text), evaluated by libxml2.
+# XPath 1.0 has no "/string()" step, so this is applied per matched node.
+_STRING_VALUE = etree.XPath('string()', smart_strings=False)
+
+# Short gender codes for <gen> values (matched case-insensitively)
+GENDER_MAP = {'masc': 'm', 'fem': 'f', 'neut': 'n', 'masculine': 'm',
+              'feminine': 'f', 'neuter': 'n'}
+
+# TSV escapes for escape_field (backslash, tab, newline, carriage return)
+_ESCAPE_TABLE = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+# Number of index rows sorted in memory before spilling a sorted run to disk
+INDEX_CHUNK_SIZE = 200_000
+
+# Fixed-width .idxb record: key_start, key_length, byte_offset, byte_length
+BINARY_INDEX_RECORD = struct.Struct('<QIQI')
+
+# Number of parsed entries between drops of already-cleared preceding siblings
+SIBLING_CLEANUP_INTERVAL = 1000
 
 
 def normalize_text(text: Optional[str]) -> str:
     """Normalize text: strip whitespace, apply NFC Unicode normalization."""
     if not text:
         return ""
-    # Strip and normalize to NFC (canonical composition)
-    normalized = unicodedata.normalize('NFC', text.strip())
-    return normalized
+    # Strip and normalize to NFC (canonical composition).
+    # ASCII and already-NFC text (the common case) is returned unchanged.
+    stripped = text.strip()
+    if stripped.isascii() or unicodedata.is_normalized('NFC', stripped):
+        return stripped
+    return unicodedata.normalize('NFC', stripped)
 
 
 def get_index_key(headword: str) -> str:
@@ -44,7 +97,10 @@ def get_index_key(headword: str) -> str:
     - Keep acronyms (all uppercase) as-is
     - Lowercase everything else for case-insensitive lookup
     """
-    if headword and len(headword) > 1 and headword == headword.upper() \
+    if headword.islower():
+        # Already lowercase (the common case)
+        return headword
+    if len(headword) > 1 and headword == headword.upper() \
         and any(c.isupper() for c in headword):
         # It's an acronym, keep it as-is
         return headword
@@ -54,28 +110,48 @@ def get_index_key(headword: str) -> str:
 
 def escape_field(text: str) -> str:
     """Escape special characters for TSV format: tab, newline, carriage return, backslash."""
-    if not text:
-        return ""
-    text = text.replace('\\', '\\\\')  # Backslash first
-    text = text.replace('\t', '\\t')   # Tab
-    text = text.replace('\n', '\\n')   # Newline
-    text = text.replace('\r', '\\r')   # Carriage return
-    return text
+    return text.translate(_ESCAPE_TABLE) if text else ""
 
 
-def extract_text_recursive(elem) -> str:
-    """Extract all text content from an element and its children."""
-    if elem is None:
-        return ""
-    # Get text and tail from element and all descendants
-    parts = []
-    if elem.text:
-        parts.append(elem.text)
-    for child in elem:
-        parts.append(extract_text_recursive(child))
-        if child.tail:
-            parts.append(child.tail)
-    return ''.join(parts)
+def free_entry(entry_elem, drop_siblings: bool) -> None:
+    """Clear a parsed <entry> and optionally drop the cleared siblings before it."""
+    entry_elem.clear(keep_tail=True)
+    if drop_siblings:
+        parent = entry_elem.getparent()
+        if parent is not None:
+            del parent[:parent.index(entry_elem)]
+
+
+def index_sort_key(row: bytes) -> bytes:
+    """
+    Sort key for an encoded index row: its escaped headword field as UTF-8
+    bytes, so the .idx is ordered for byte-wise binary search.
+    """
+    return row.split(b'\t', 1)[0]
+
+
+def spill_index_run(rows: List[Tuple[bytes, bytes]]) -> BinaryIO:
+    """
+    Sort (key, row) pairs by key and write the rows to a temporary file,
+    rewound for reading.
+    """
+    rows.sort(key=itemgetter(0))
+    run = tempfile.TemporaryFile()
+    run.writelines(row for _, row in rows)
+    run.seek(0)
+    return run
+
+
+def write_binary_index(rows: Iterable[bytes], keys_file: BinaryIO,
+                       records_file: BinaryIO) -> Iterator[bytes]:
+    """Yield sorted .idx rows unchanged while writing their .keys/.idxb form."""
+    key_start = 0
+    for row in rows:
+        key, offset, length = row.rstrip(b'\n').split(b'\t')
+        keys_file.write(key)
+        records_file.write(BINARY_INDEX_RECORD.pack(key_start, len(key), int(offset), int(length)))
+        key_start += len(key)
+        yield row
 
 
 def parse_entry(entry_elem) -> Optional[Tuple[str, str, str, str, str, str]]:
@@ -85,66 +161,67 @@ def parse_entry(entry_elem) -> Optional[Tuple[str, str, str, str, str, str]]:
     Returns: (headword, pos, gender, pron, translations, definition) or None if invalid
     """
     # Extract headword from <form>/<orth>
-    orth_elem = entry_elem.find(f".//{TEI_NS}orth")
-    if orth_elem is None or not orth_elem.text:
+    orth_elems = _ORTH(entry_elem)
+    if not orth_elems or not orth_elems[0].text:
         return None  # Skip entries without headword
 
-    headword = normalize_text(orth_elem.text)
+    headword = normalize_text(orth_elems[0].text)
     if not headword:
         return None
 
     # Extract pronunciation(s) from <form>/<pron>
     # Use only the first pronunciation to avoid having multiple IPAs
-    pron_elems = entry_elem.findall(f".//{TEI_NS}form/{TEI_NS}pron")
+    pron_elems = _PRON(entry_elem)
     pron = ""
     if pron_elems and pron_elems[0].text:
         pron = normalize_text(pron_elems[0].text)
 
     # Extract POS from <gramGrp>/<pos>
-    pos_elem = entry_elem.find(f".//{TEI_NS}pos")
-    pos = normalize_text(pos_elem.text) if pos_elem is not None and pos_elem.text else ""
+    pos_elems = _POS(entry_elem)
+    pos = normalize_text(pos_elems[0].text) if pos_elems else ""
 
     # Extract gender from <gramGrp>/<gen>
-    gen_elem = entry_elem.find(f".//{TEI_NS}gen")
-    gender_raw = normalize_text(gen_elem.text) if gen_elem is not None and gen_elem.text else ""
-    # Map to short form: masc->m, fem->f, neut->n
-    gender_map = {'masc': 'm', 'fem': 'f', 'neut': 'n', 'masculine': 'm',
-                  'feminine': 'f', 'neuter': 'n'}
-    gender = gender_map.get(gender_raw.lower(), gender_raw[:1]) if gender_raw else ""
+    gen_elems = _GEN(entry_elem)
+    gender_raw = normalize_text(gen_elems[0].text) if gen_elems else ""
+    # Map to short form: masc->m, fem->f, neut->n. Values are usually already
+    # lowercase, so only lowercase (allocating a copy) when the exact key misses
+    if not gender_raw:
+        gender = ""
+    else:
+        gender = GENDER_MAP.get(gender_raw) \
+            or GENDER_MAP.get(gender_raw.lower(), gender_raw[:1])
 
     # Extract translations from <sense>/<cit type="trans">/<quote>
     # Note: cit may have xml:lang attribute but we take all translations
-    quote_elems = entry_elem.findall(f".//{TEI_NS}sense/{TEI_NS}cit[@type='trans']/{TEI_NS}quote")
-    translations = []
+    quote_elems = _QUOTES(entry_elem)
+    # A dict drops duplicate translations while keeping their sense order
+    translations: Dict[str, None] = {}
     for quote in quote_elems:
-        trans_text = extract_text_recursive(quote)
-        trans_text = normalize_text(trans_text)
+        trans_text = normalize_text(_STRING_VALUE(quote))
         if trans_text:
-            translations.append(trans_text)
+            translations[trans_text] = None
 
     if not translations:
         return None  # Skip entries without translations
 
-    # Remove duplicate translations
-    translations = list(set(translations))
     translations_str = ';'.join(translations)
 
     # Extract definition from <sense>/<def> (optional)
-    def_elems = entry_elem.findall(f".//{TEI_NS}sense/{TEI_NS}def")
-    defs = []
+    def_elems = _DEFS(entry_elem)
+    defs: Dict[str, None] = {}
     for def_elem in def_elems:
-        def_text = extract_text_recursive(def_elem)
-        def_text = normalize_text(def_text)
+        def_text = normalize_text(_STRING_VALUE(def_elem))
         if def_text:
-            defs.append(def_text)
+            defs[def_text] = None
     definition = ' | '.join(defs) if defs else ""
 
     return (headword, pos, gender, pron, translations_str, definition)
 
 
-def process_tei_file(tei_path: Path) -> Tuple[int, int]:
+def process_tei_file(tei_path: Path, binary_index: bool = False) -> Tuple[int, int]:
     """
-    Process a single TEI file and generate .u8 and .idx files.
+    Process a single TEI file and generate .u8 and .idx files
+    (plus .keys and .idxb files if binary_index is set).
 
     Returns: (total_entries, successful_entries)
     """
@@ -154,20 +231,36 @@ def process_tei_file(tei_path: Path) -> Tuple[int, int]:
     base_name = tei_path.stem  # e.g., 'fra-spa'
     u8_path = tei_path.parent / f"{base_name}.u8"
     idx_path = tei_path.parent / f"{base_name}.idx"
+    keys_path = tei_path.parent / f"{base_name}.keys"
+    idxb_path = tei_path.parent / f"{base_name}.idxb"
 
     # Track entries and index data
     entries_processed = 0
     entries_written = 0
-    index_data = []  # List of (headword_lower, offset, length)
+    index_rows = []  # (key bytes, encoded row) pairs not yet spilled to disk
+    index_runs = []  # Sorted runs of index rows spilled to temporary files
 
     try:
-        # Open output file
-        with open(u8_path, 'w', encoding='utf-8') as u8_file:
-            # Parse TEI with iterparse for memory efficiency
+        # Open input and output files (binary, 1 MiB buffers); byte offsets
+        # are tracked manually instead of calling tell() on every entry
+        offset = 0
+        with open(tei_path, 'rb', buffering=1 << 20) as tei_file, \
+             open(u8_path, 'wb', buffering=1 << 20) as u8_file:
+            # The TEI is read once, front to back: let the kernel read ahead
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(tei_file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+            # Parse TEI with iterparse for memory efficiency. No DTD, entity
+            # or network work is needed for dictionary entries. Blank text is
+            # kept: it separates words in mixed content like <hi>a</hi> <hi>b</hi>
             context = etree.iterparse(
-                str(tei_path),
+                tei_file,
                 events=('end',),
-                tag=f'{TEI_NS}entry'
+                tag=f'{TEI_NS}entry',
+                huge_tree=True,
+                resolve_entities=False,
+                load_dtd=False,
+                no_network=True
             )
 
             for _, entry_elem in context:
@@ -175,40 +268,37 @@ def process_tei_file(tei_path: Path) -> Tuple[int, int]:
 
                 # Parse entry
                 result = parse_entry(entry_elem)
+                drop_siblings = entries_processed % SIBLING_CLEANUP_INTERVAL == 0
                 if result is None:
-                    entry_elem.clear()
+                    free_entry(entry_elem, drop_siblings)
                     continue
 
                 headword, pos, gender, pron, translations, definition = result
 
-                # Record byte offset before writing
-                offset = u8_file.tell()
-
                 # Escape fields and write TSV line
-                fields = [
-                    escape_field(headword),
-                    escape_field(pos),
-                    escape_field(gender),
-                    escape_field(pron),
-                    escape_field(translations),
-                    escape_field(definition)
-                ]
-                line = '\t'.join(fields) + '\n'
-                u8_file.write(line)
-
-                # Calculate line length in bytes
-                length = u8_file.tell() - offset
+                line = (f"{escape_field(headword)}\t{escape_field(pos)}\t"
+                        f"{escape_field(gender)}\t{escape_field(pron)}\t"
+                        f"{escape_field(translations)}\t{escape_field(definition)}\n")
+                line_bytes = line.encode('utf-8')
+                u8_file.write(line_bytes)
+                length = len(line_bytes)
 
                 # Add to index (keep acronyms, lowercase everything else)
                 headword_index_key = get_index_key(headword)
-                index_data.append((headword_index_key, offset, length))
+                key_bytes = escape_field(headword_index_key).encode('utf-8')
+                index_row = b'%s\t%d\t%d\n' % (key_bytes, offset, length)
+                index_rows.append((key_bytes, index_row))
+                offset += length
+
+                # Keep peak memory bounded by spilling sorted runs to disk
+                if len(index_rows) >= INDEX_CHUNK_SIZE:
+                    index_runs.append(spill_index_run(index_rows))
+                    index_rows = []
 
                 entries_written += 1
 
                 # Clear element to free memory
-                entry_elem.clear()
-                while entry_elem.getprevious() is not None:
-                    del entry_elem.getparent()[0]
+                free_entry(entry_elem, drop_siblings)
 
                 # Progress indicator
                 if entries_processed % 5000 == 0:
@@ -216,23 +306,33 @@ def process_tei_file(tei_path: Path) -> Tuple[int, int]:
 
         print(f"  Processed {entries_processed:,} entries (wrote {entries_written:,})")
 
-        # Sort index by headword for binary search
+        # Sort index by headword for binary search, merging any spilled runs
         print("  Sorting index...")
-        index_data.sort(key=lambda x: x[0])
+        if index_runs:
+            if index_rows:
+                index_runs.append(spill_index_run(index_rows))
+                index_rows = []
+            sorted_rows = heapq.merge(*index_runs, key=index_sort_key)
+        else:
+            index_rows.sort(key=itemgetter(0))
+            sorted_rows = (row for _, row in index_rows)
 
         # Write index file
         print(f"  Writing index file: {idx_path.name}")
-        with open(idx_path, 'w', encoding='utf-8') as idx_file:
-            for headword_index_key, offset, length in index_data:
-                # Escape headword for safety
-                headword_escaped = escape_field(headword_index_key)
-                idx_file.write(f"{headword_escaped}\t{offset}\t{length}\n")
+        with open(idx_path, 'wb') as idx_file:
+            if binary_index:
+                print(f"  Writing binary index files: {keys_path.name}, {idxb_path.name}")
+                with open(keys_path, 'wb', buffering=1 << 20) as keys_file, \
+                     open(idxb_path, 'wb', buffering=1 << 20) as records_file:
+                    idx_file.writelines(write_binary_index(sorted_rows, keys_file, records_file))
+            else:
+                idx_file.writelines(sorted_rows)
 
         # Report file sizes
-        u8_size_mb = u8_path.stat().st_size / (1024 * 1024)
-        idx_size_mb = idx_path.stat().st_size / (1024 * 1024)
-        print(f"  ✓ Generated: {u8_path.name} ({u8_size_mb:.2f} MB)")
-        print(f"  ✓ Generated: {idx_path.name} ({idx_size_mb:.2f} MB)")
+        generated = [u8_path, idx_path] + ([keys_path, idxb_path] if binary_index else [])
+        for path in generated:
+            size_mb = path.stat().st_size / (1024 * 1024)
+            print(f"  ✓ Generated: {path.name} ({size_mb:.2f} MB)")
 
         return (entries_processed, entries_written)
 
@@ -242,9 +342,32 @@ def process_tei_file(tei_path: Path) -> Tuple[int, int]:
         traceback.print_exc()
         return (entries_processed, 0)
 
+    finally:
+        for run in index_runs:
+            run.close()
+
+
+def process_tei_file_captured(tei_path: Path, binary_index: bool = False) -> Tuple[int, int, str]:
+    """
+    Run process_tei_file in a worker process, capturing its console output
+    (stdout and stderr, e.g. tracebacks) so that reports from parallel
+    workers are not interleaved.
+
+    Returns: (total_entries, successful_entries, output)
+    """
+    output = io.StringIO()
+    with redirect_stdout(output), redirect_stderr(output):
+        processed, written = process_tei_file(tei_path, binary_index)
+    return (processed, written, output.getvalue())
+
 
 def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description="Convert TEI dictionaries to .u8/.idx files.")
+    parser.add_argument('--binary-index', action='store_true',
+                        help="also write binary .keys/.idxb index files")
+    args = parser.parse_args()
+
     script_dir = Path(__file__).parent
 
     print("=" * 70)
@@ -268,8 +391,22 @@ def main():
     total_written = 0
     successful_files = 0
 
-    for tei_file in tei_files:
-        processed, written = process_tei_file(tei_file)
+    # Dictionaries are independent, so convert them in parallel processes
+    workers = min(len(tei_files), os.cpu_count() or 1)
+    if workers > 1:
+        print(f"\nConverting with {workers} worker processes...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(process_tei_file_captured, tei_file, args.binary_index)
+                       for tei_file in tei_files]
+            results = []
+            for future in as_completed(futures):
+                processed, written, output = future.result()
+                print(output, end='', flush=True)
+                results.append((processed, written))
+    else:
+        results = [process_tei_file(tei_file, args.binary_index) for tei_file in tei_files]
+
+    for processed, written in results:
         total_processed += processed
         total_written += written
         if written > 0:
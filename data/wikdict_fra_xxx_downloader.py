@@ -9,29 +9,26 @@ Automatically discovers and downloads all fra-*.tei dictionaries from WikDict.
 No hardcoded language list - dynamically parses the directory listing.
 """
 
+import os
 import re
+import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from urllib.request import urlopen, urlretrieve
-from urllib.error import URLError, HTTPError
-from html.parser import HTMLParser
+from urllib.request import urlopen
+from urllib.error import ContentTooShortError, URLError, HTTPError
 
 
 BASE_URL = "https://download.wikdict.com/dictionaries/tei/recommended/"
 
+# Number of dictionaries downloaded concurrently
+MAX_PARALLEL_DOWNLOADS = 8
 
-class DirectoryParser(HTMLParser):
-    """Parse Apache/nginx directory listing to extract fra-*.tei filenames."""
+# Links to fra-*.tei files in an Apache/nginx directory listing
+HREF_PATTERN = re.compile(rb'href="(fra-[^"/]*\.tei)"')
 
-    def __init__(self):
-        super().__init__()
-        self.files = []
-
-    def handle_starttag(self, tag, attrs):
-        if tag == 'a':
-            for attr, value in attrs:
-                if attr == 'href' and value.startswith('fra-') and value.endswith('.tei'):
-                    self.files.append(value)
+# Fallback: bare "fra-xxx.tei" mentions anywhere in the listing
+NAME_PATTERN = re.compile(rb'fra-[a-z]{3}\.tei')
 
 
 def fetch_file_list():
@@ -39,19 +36,16 @@ def fetch_file_list():
     print(f"Fetching directory listing from {BASE_URL}...")
     try:
         with urlopen(BASE_URL) as response:
-            html = response.read().decode('utf-8')
-
-        parser = DirectoryParser()
-        parser.feed(html)
+            html = response.read()
 
         # Sort files alphabetically for consistent output
-        files = sorted(set(parser.files))
+        files = sorted(set(name.decode('utf-8') for name in HREF_PATTERN.findall(html)))
 
         if not files:
             print("Warning: No fra-*.tei files found in directory listing.")
-            print("Falling back to regex pattern matching...")
+            print("Falling back to bare filename matching...")
             # Fallback: extract from text patterns like "fra-xxx.tei"
-            files = sorted(set(re.findall(r'fra-[a-z]{3}\.tei', html)))
+            files = sorted(set(name.decode('utf-8') for name in NAME_PATTERN.findall(html)))
 
         return files
 
@@ -61,32 +55,47 @@ def fetch_file_list():
 
 
 def download_file(filename, output_dir):
-    """Download a single file with progress indication."""
+    """
+    Download a single file, streaming it to disk in 1 MiB chunks.
+
+    Called from several threads at once, so each status line is printed
+    with its newline in a single write to keep lines from interleaving.
+    """
     url = BASE_URL + filename
     output_path = output_dir / filename
 
     # Skip if already exists
     if output_path.exists():
-        print(f"  ✓ {filename} (already exists, skipping)")
+        print(f"  ✓ {filename} (already exists, skipping)\n", end='', flush=True)
         return True
 
+    # Download to a .part file and only rename it once complete, so an
+    # interrupted download is never mistaken for a finished one
+    part_path = output_path.with_suffix('.tei.part')
     try:
-        print(f"  ⬇ {filename} ... ", end='', flush=True)
-
-        def progress_hook(block_count, block_size, total_size):
-            if total_size > 0:
-                downloaded = block_count * block_size
-                percent = min(100, downloaded * 100 // total_size)
-                print(f"\r  ⬇ {filename} ... {percent}%", end='', flush=True)
-
-        urlretrieve(url, output_path, reporthook=progress_hook)
-        print(f"\r  ✓ {filename} (downloaded)")
+        with urlopen(url) as response, open(part_path, 'wb') as output_file:
+            shutil.copyfileobj(response, output_file, length=1 << 20)
+            expected = response.headers.get('Content-Length')
+            received = output_file.tell()
+
+        # A short body just ends the copy at EOF, so check the size like urlretrieve
+        if expected is not None and received != int(expected):
+            raise ContentTooShortError(
+                f"retrieval incomplete: got only {received} out of {expected} bytes", None)
+
+        os.replace(part_path, output_path)
+        size_mb = output_path.stat().st_size / (1024 * 1024)
+        print(f"  ✓ {filename} (downloaded, {size_mb:.1f} MB)\n", end='', flush=True)
         return True
 
-    except (URLError, HTTPError) as e:
-        print(f"\r  ✗ {filename} (error: {e})")
+    except (URLError, HTTPError, OSError) as e:
+        # OSError also covers connection resets while streaming the body
+        print(f"  ✗ {filename} (error: {e})\n", end='', flush=True)
         return False
 
+    finally:
+        part_path.unlink(missing_ok=True)
+
 
 def main():
     """Main entry point."""
@@ -115,10 +124,10 @@ def main():
     print(f"Downloading to: {output_dir}")
     print()
 
-    success_count = 0
-    for filename in files:
-        if download_file(filename, output_dir):
-            success_count += 1
+    # Downloads are I/O-bound, so threads overlap them well
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS) as executor:
+        results = list(executor.map(lambda f: download_file(f, output_dir), files))
+    success_count = sum(results)
 
     print()
     print("=" * 70)
@@ -1,12 +1,13 @@
 from PIL import Image
 import os
 
-# Define the required icon sizes
+# Define the required icon sizes (largest first: the smaller icons are
+# derived from it instead of re-filtering the full-size source each time)
 icon_sizes = {
-    "icon16.png": (16, 16),
-    "icon32.png": (32, 32),
-    "icon48.png": (48, 48),
     "icon128.png": (128, 128),
+    "icon48.png": (48, 48),
+    "icon32.png": (32, 32),
+    "icon16.png": (16, 16),
 }
 
 # Path to the source image
@@ -22,9 +23,12 @@ with Image.open(source_image) as img:
     # Ensure the image is in RGBA mode (supports transparency)
     img = img.convert("RGBA")
 
-    # Create resized icons
+    # Downsample the full-size source once, to the largest icon size
+    largest_img = img.resize(max(icon_sizes.values()), Image.Resampling.LANCZOS)
+
+    # Create resized icons from the largest one
     for filename, size in icon_sizes.items():
-        resized_img = img.resize(size, Image.Resampling.LANCZOS)
+        resized_img = largest_img.resize(size, Image.Resampling.LANCZOS)
         resized_img.save(filename, format="PNG")
         print(f"Saved {filename} with size {size}")
 